@@ -7,18 +7,40 @@ Analyzes local git repository PRs and scores them based on the AI Measurement Fr
 import os
 import sys
 import json
+import re
 import subprocess
 import sqlite3
 import hashlib
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+import atexit
+import asyncio
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 import click
 
 from dateutil import parser as date_parser
 from dateutil.relativedelta import relativedelta
-from openai import OpenAI
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv
 
+try:
+    import blake3
+except ImportError:  # Optional: SIMD-accelerated hashing for cache keys
+    blake3 = None
+
+try:
+    import orjson
+except ImportError:  # Optional: faster parsing of LLM JSON responses
+    orjson = None
+
+try:
+    import numpy
+except ImportError:  # Optional: vectorized semantic cache search
+    numpy = None
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
@@ -26,6 +48,57 @@ load_dotenv()
 CACHE_DB_PATH = "db/llm_cache.db"
 ANALYSIS_DB_PATH = "db/pr_analysis.db"
 
+# Bumped whenever init_analysis_db gains a migration (merge_message, repo_path,
+# impact_score, dashboard indexes); databases already at this version skip the schema checks
+CURRENT_SCHEMA_VERSION = 5
+
+# Set by --verbose; enables per-merge debug logging
+VERBOSE = False
+
+# Threads expanding merges into PR commits; each holds its own git processes, so
+# keep this bounded to avoid running out of file descriptors on large repos
+MAX_GIT_WORKERS = 8
+
+# Commits listed on one git command line, well under the OS argument length limit
+MAX_GIT_REVS_PER_CALL = 1000
+
+# Whether git supports --diff-merges, checked on first use
+_git_diff_merges: Optional[bool] = None
+
+# Older SQLite builds cap bound parameters per statement at 999
+SQLITE_MAX_PARAMS = 900
+
+# Semantic cache configuration (opt-in via --semantic-cache)
+EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+# PRs whose context is under ~500 tokens can share one request when batching is enabled
+SMALL_PR_CONTEXT_CHARS = 2000
+MAX_BATCH_SIZE = 8
+
+# Rate limits, dropped connections/timeouts and 5xx responses are retried with exponential
+# backoff (2s, 4s, 8s, ...) instead of scoring the merge as an error
+MAX_API_RETRIES = 5
+RETRY_BASE_DELAY = 2.0
+RETRYABLE_API_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# PR number references in commit subjects, e.g. "Fix login (#12345)"
+_PR_NUMBER_RE = re.compile(r'#\d+')
+
+# git --shortstat summary, e.g. " 3 files changed, 45 insertions(+), 12 deletions(-)"
+_STAT_RE = re.compile(r'(\d+) files? changed(?:, (\d+) insertions?\(\+\))?(?:, (\d+) deletions?\(-\))?')
+
+# One level of revert title: "Revert: x", 'Revert "x"' (up to the last quote), "Revert 'x'"
+# or "Revert x". A bare title can't start with a quote, so unclosed quotes stop the parse.
+_REVERT = re.compile(r"""^[Rr]evert(?::(?P<colon>.*)| "(?P<double>.*)"| '(?P<single>.*)'| (?!["'])(?P<bare>.*))""",
+                     re.DOTALL)
+
+# Trailing PR numbers, e.g. " (#123)"
+_PR_NUM_SUFFIX = re.compile(r'\s*\(#\d+\)$')
+
+# JSON object or array in an LLM reply, optionally inside a ```json fence
+_JSON_BLOCK = re.compile(r'```(?:json)?\s*(\{.*\}|\[.*\])\s*```|(\{.*\}|\[.*\])', re.DOTALL)
+
 # Impact scoring criteria
 SCORING_CRITERIA = """
 You are analyzing a software engineering merge (equivalent to a Pull Request) to determine its impact score.
@@ -52,6 +125,47 @@ Provide your assessment in this exact JSON format:
 }
 """
 
+# Constant system prompt sent first on every call, ahead of the per-PR details. At ~300 tokens
+# it's below the 1024-token minimum for OpenAI's automatic prompt caching, so it isn't cached;
+# padding it past that would bill more (half-price) tokens than the unpadded prompt costs.
+SYSTEM_PROMPT = (
+    "You are an expert at analyzing software engineering merges and scoring them based on the DX AI Measurement Framework.\n"
+    + SCORING_CRITERIA
+)
+
+# Semantic cache entries only embed the per-PR context, so they're tagged with the prompt
+# they were scored under; editing the criteria leaves older entries unused
+SEMANTIC_PROMPT_FINGERPRINT = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:16]
+
+
+# Reused SQLite connections, one per thread and database path
+_db_connections = threading.local()
+
+
+def configure_connection(conn: sqlite3.Connection):
+    """Apply the performance pragmas shared by the cache and analysis databases."""
+    # Both databases have a single writer (this script), so WAL with NORMAL sync is
+    # safe and avoids an fsync on every commit
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
+
+
+def get_db_connection(db_path: str) -> sqlite3.Connection:
+    """Get this thread's connection to a database, opening it on first use."""
+    connections = getattr(_db_connections, 'by_path', None)
+    if connections is None:
+        connections = _db_connections.by_path = {}
+    
+    conn = connections.get(db_path)
+    if conn is None:
+        # Autocommit mode; callers that batch writes open their own transaction
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        configure_connection(conn)
+        connections[db_path] = conn
+    return conn
+
 
 def init_cache_db():
     """Initialize the SQLite cache database."""
@@ -61,6 +175,7 @@ def init_cache_db():
         os.makedirs(db_dir)
     
     conn = sqlite3.connect(CACHE_DB_PATH)
+    configure_connection(conn)
     cursor = conn.cursor()
     
     # Create table for LLM response cache
@@ -80,6 +195,31 @@ def init_cache_db():
         CREATE INDEX IF NOT EXISTS idx_prompt_hash ON llm_cache(prompt_hash)
     ''')
     
+    # Create table for the semantic cache (prompt embeddings -> responses)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS semantic_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            embedding BLOB NOT NULL,
+            response_content TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_fingerprint TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Add prompt_fingerprint column if it doesn't exist; older entries keep NULL and are never matched
+    cursor.execute("PRAGMA table_info(semantic_cache)")
+    if 'prompt_fingerprint' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE semantic_cache ADD COLUMN prompt_fingerprint TEXT')
+        cursor.execute('DROP INDEX IF EXISTS idx_semantic_model')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_semantic_prompt ON semantic_cache(model, prompt_fingerprint)
+    ''')
+    
+    # Keep existing entries reachable if the hash scheme changed (e.g. blake3 got installed)
+    migrate_cache_keys(conn)
+    
     conn.commit()
     conn.close()
 
@@ -92,8 +232,16 @@ def init_analysis_db():
         os.makedirs(db_dir)
     
     conn = sqlite3.connect(ANALYSIS_DB_PATH)
+    configure_connection(conn)
     cursor = conn.cursor()
     
+    # Nothing to do once the schema has been brought up to date
+    cursor.execute("PRAGMA user_version")
+    schema_version = cursor.fetchone()[0]
+    if schema_version >= CURRENT_SCHEMA_VERSION:
+        conn.close()
+        return
+    
     # Create table for PR analysis results
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS pr_analysis (
@@ -143,78 +291,222 @@ def init_analysis_db():
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_merge_date ON pr_analysis(merge_date)
     ''')
+    # Version 4 created idx_pa_filter led by author, which left the unfiltered list sorting in a temp b-tree
+    if schema_version == 4:
+        cursor.execute('DROP INDEX IF EXISTS idx_pa_filter')
+    # Serves the dashboard list in impact_score order and covers the summary aggregates
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pa_filter
+        ON pr_analysis(impact_score, author, merge_date, additions, deletions, files_changed)
+    ''')
+    # Covers the per-author GROUP BY and serves the author-filtered list in score order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pa_author
+        ON pr_analysis(author, impact_score, merge_date, additions, deletions, files_changed)
+    ''')
     
+    cursor.execute(f"PRAGMA user_version = {CURRENT_SCHEMA_VERSION}")
     conn.commit()
     conn.close()
 
 
 def save_analysis_to_db(scored_prs: List[Dict]):
     """Save analysis results to database."""
-    conn = sqlite3.connect(ANALYSIS_DB_PATH)
-    cursor = conn.cursor()
-    
-    for pr in scored_prs:
-        cursor.execute('''
+    conn = get_db_connection(ANALYSIS_DB_PATH)
+    
+    rows = [(
+        pr['merge_hash'], pr['merge_subject'], pr.get('merge_message', ''), pr['author'], pr['merge_date'],
+        pr['commits_count'], pr['additions'], pr['deletions'], pr['files_changed'],
+        pr['development_hours'], pr['review_hours'], pr['impact_score'], pr['impact_assessment'],
+        pr.get('repo_path', '')
+    ) for pr in scored_prs]
+    
+    # One transaction for the whole batch; commits on success, rolls back on error
+    with conn:
+        conn.execute('BEGIN')
+        conn.executemany('''
             INSERT OR REPLACE INTO pr_analysis (
                 merge_hash, merge_subject, merge_message, author, merge_date, commits_count,
                 additions, deletions, files_changed, development_hours, review_hours,
                 impact_score, impact_assessment, repo_path
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            pr['merge_hash'], pr['merge_subject'], pr.get('merge_message', ''), pr['author'], pr['merge_date'],
-            pr['commits_count'], pr['additions'], pr['deletions'], pr['files_changed'],
-            pr['development_hours'], pr['review_hours'], pr['impact_score'], pr['impact_assessment'],
-            pr.get('repo_path', '')
-        ))
+        ''', rows)
     
-    conn.commit()
-    conn.close()
     click.echo(f"  Analysis results saved to database: {len(scored_prs)} records")
 
 
+# BLAKE3 keys are namespaced so they never collide with legacy SHA-256 keys
+PROMPT_HASH_PREFIX = "blake3:" if blake3 else ""
+
+# Bumped when the way prompts are turned into cache keys changes, so existing
+# entries get re-keyed once (1: whitespace-normalized prompts)
+CACHE_KEY_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt_content: str) -> str:
+    """Collapse whitespace so re-indented or re-wrapped diffs map to the same cache entry."""
+    return _WHITESPACE_RE.sub(' ', prompt_content).strip()
+
+
 def get_prompt_hash(prompt_content: str, model: str) -> str:
-    """Generate a hash for the prompt content and model."""
-    combined = f"{model}:{prompt_content}"
-    return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+    """Generate a hash for the (whitespace-normalized) prompt content and model."""
+    combined = f"{model}:{normalize_prompt(prompt_content)}".encode('utf-8')
+    if blake3:
+        return PROMPT_HASH_PREFIX + blake3.blake3(combined).hexdigest()
+    # SHA-256 is hardware accelerated on most CPUs, so it stays the fallback
+    return hashlib.sha256(combined).hexdigest()
 
 
-def get_cached_response(prompt_content: str, model: str) -> Optional[str]:
-    """Get cached LLM response if it exists."""
-    prompt_hash = get_prompt_hash(prompt_content, model)
-    
-    conn = sqlite3.connect(CACHE_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'SELECT response_content FROM llm_cache WHERE prompt_hash = ?',
-        (prompt_hash,)
-    )
+def migrate_cache_keys(conn: sqlite3.Connection):
+    """Re-key cached responses written with a different hash scheme than the current one."""
+    key_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if key_version < CACHE_KEY_VERSION:
+        query = "SELECT id, prompt_content, model FROM llm_cache"
+    elif PROMPT_HASH_PREFIX:
+        query = "SELECT id, prompt_content, model FROM llm_cache WHERE prompt_hash NOT LIKE 'blake3:%'"
+    else:
+        query = "SELECT id, prompt_content, model FROM llm_cache WHERE prompt_hash LIKE 'blake3:%'"
     
-    result = cursor.fetchone()
-    conn.close()
+    rows = conn.execute(query).fetchall()
+    if rows:
+        conn.executemany(
+            'UPDATE OR REPLACE llm_cache SET prompt_hash = ? WHERE id = ?',
+            [(get_prompt_hash(prompt_content, model), row_id) for row_id, prompt_content, model in rows]
+        )
     
-    return result[0] if result else None
+    if key_version < CACHE_KEY_VERSION:
+        conn.execute(f"PRAGMA user_version = {CACHE_KEY_VERSION}")
+
+
+def get_cached_responses(prompt_hashes: List[str]) -> Dict[str, str]:
+    """Get cached LLM responses for many prompt hashes, keyed by hash."""
+    conn = get_db_connection(CACHE_DB_PATH)
+    unique_hashes = list(dict.fromkeys(prompt_hashes))
+    responses = {}
+    
+    # Query in chunks that stay under SQLite's bound-parameter limit
+    for start in range(0, len(unique_hashes), SQLITE_MAX_PARAMS):
+        chunk = unique_hashes[start:start + SQLITE_MAX_PARAMS]
+        placeholders = ', '.join('?' * len(chunk))
+        responses.update(conn.execute(
+            f'SELECT prompt_hash, response_content FROM llm_cache WHERE prompt_hash IN ({placeholders})',
+            chunk
+        ).fetchall())
+    
+    return responses
 
 
 def cache_response(prompt_content: str, model: str, response_content: str):
     """Cache an LLM response."""
     prompt_hash = get_prompt_hash(prompt_content, model)
     
-    conn = sqlite3.connect(CACHE_DB_PATH)
-    cursor = conn.cursor()
+    conn = get_db_connection(CACHE_DB_PATH)
     
     try:
-        cursor.execute('''
+        conn.execute('''
             INSERT OR REPLACE INTO llm_cache 
             (prompt_hash, prompt_content, response_content, model)
             VALUES (?, ?, ?, ?)
         ''', (prompt_hash, prompt_content, response_content, model))
-        
-        conn.commit()
     except sqlite3.Error as e:
         click.echo(f"Error caching response: {e}", err=True)
-    finally:
-        conn.close()
+
+
+# Semantic cache entries per model, loaded from semantic_cache on first use: the cached
+# responses and their normalized embeddings. With NumPy the embeddings are the first
+# len(responses) rows of a float32 matrix with spare capacity; otherwise a list of arrays.
+_semantic_responses: Dict[str, List[str]] = {}
+_semantic_embeddings: Dict[str, object] = {}
+
+
+def normalize_embedding(embedding: List[float]) -> array:
+    """Scale an embedding to unit length so a dot product gives cosine similarity."""
+    norm = sum(x * x for x in embedding) ** 0.5 or 1.0
+    return array('f', (x / norm for x in embedding))
+
+
+async def get_prompt_embedding(client: AsyncOpenAI, text: str) -> Optional[array]:
+    """Embed prompt text for semantic cache lookups, or return None if the call fails."""
+    try:
+        response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        return normalize_embedding(response.data[0].embedding)
+    except Exception as e:
+        click.echo(f"    Error computing embedding for semantic cache: {e}", err=True)
+        return None
+
+
+def load_semantic_entries(model: str) -> List[str]:
+    """Load a model's semantic cache entries into memory, returning the cached responses."""
+    responses = _semantic_responses.get(model)
+    if responses is None:
+        conn = get_db_connection(CACHE_DB_PATH)
+        rows = conn.execute(
+            'SELECT embedding, response_content FROM semantic_cache WHERE model = ? AND prompt_fingerprint = ?',
+            (model, SEMANTIC_PROMPT_FINGERPRINT)
+        ).fetchall()
+        responses = _semantic_responses[model] = []
+        _semantic_embeddings[model] = None if numpy else []
+        for blob, response_content in rows:
+            embedding = array('f')
+            embedding.frombytes(blob)
+            add_semantic_entry(model, embedding, response_content)
+    return responses
+
+
+def add_semantic_entry(model: str, embedding: array, response_content: str):
+    """Append an entry to a model's in-memory semantic cache."""
+    responses = load_semantic_entries(model)
+    if numpy:
+        matrix = _semantic_embeddings[model]
+        if matrix is None or len(matrix) == len(responses):
+            # Double the capacity so adding entries one at a time doesn't copy the matrix each time
+            grown = numpy.empty((max(2 * len(responses), 64), len(embedding)), dtype=numpy.float32)
+            if matrix is not None:
+                grown[:len(responses)] = matrix
+            matrix = _semantic_embeddings[model] = grown
+        matrix[len(responses)] = numpy.frombuffer(embedding, dtype=numpy.float32)
+    else:
+        _semantic_embeddings[model].append(embedding)
+    # Responses go last: a concurrent scan only reads as many embeddings as there are responses
+    responses.append(response_content)
+
+
+def get_semantic_cached_response(embedding: array, model: str) -> Optional[str]:
+    """Get the cached response for the most similar prompt, if it clears the similarity threshold."""
+    responses = load_semantic_entries(model)
+    if not responses:
+        return None
+    
+    if numpy:
+        count = len(responses)
+        similarities = _semantic_embeddings[model][:count] @ numpy.frombuffer(embedding, dtype=numpy.float32)
+        best = int(similarities.argmax())
+        best_similarity, best_response = float(similarities[best]), responses[best]
+    else:
+        best_similarity = 0.0
+        best_response = None
+        for cached_embedding, response_content in zip(_semantic_embeddings[model], responses):
+            similarity = sum(map(float.__mul__, embedding, cached_embedding))
+            if similarity > best_similarity:
+                best_similarity, best_response = similarity, response_content
+    
+    return best_response if best_similarity >= SEMANTIC_CACHE_THRESHOLD else None
+
+
+def cache_semantic_response(embedding: array, model: str, response_content: str):
+    """Store a response in the semantic cache under its prompt embedding."""
+    conn = get_db_connection(CACHE_DB_PATH)
+    
+    try:
+        conn.execute(
+            'INSERT INTO semantic_cache (embedding, response_content, model, prompt_fingerprint) VALUES (?, ?, ?, ?)',
+            (embedding.tobytes(), response_content, model, SEMANTIC_PROMPT_FINGERPRINT)
+        )
+        add_semantic_entry(model, embedding, response_content)
+    except sqlite3.Error as e:
+        click.echo(f"Error caching semantic response: {e}", err=True)
 
 
 def parse_relative_date(date_string: str) -> datetime:
@@ -258,6 +550,11 @@ def parse_relative_date(date_string: str) -> datetime:
         raise ValueError(f"Unknown time unit: {unit}")
 
 
+def parse_git_iso_date(date_str: str) -> datetime:
+    """Parse a `--date=iso` git timestamp like '2024-05-01 12:34:56 +0000'."""
+    return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S %z')
+
+
 def run_git_command(cmd: List[str], cwd: str) -> str:
     """Run a git command and return the output."""
     try:
@@ -275,151 +572,362 @@ def run_git_command(cmd: List[str], cwd: str) -> str:
         sys.exit(1)
 
 
+def run_git_stream(cmd: List[str], cwd: str) -> Iterator[str]:
+    """Run a git command and yield its output lines as git writes them."""
+    proc = subprocess.Popen(
+        ['git'] + cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1
+    )
+    try:
+        for line in proc.stdout:
+            yield line.rstrip('\n')
+        
+        if proc.wait() != 0:
+            click.echo(f"Git command failed: {' '.join(cmd)}", err=True)
+            click.echo(f"Error: {proc.stderr.read()}", err=True)
+            sys.exit(1)
+    finally:
+        # Don't leave git running (or a zombie) if the caller stops iterating early
+        if proc.poll() is None:
+            proc.terminate()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+class GitCatFile:
+    """Long-lived `git cat-file --batch` process for reading objects without spawning git per lookup."""
+    
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        # stdout stays buffered: readline() on an unbuffered pipe costs one read syscall per byte
+        self.proc = subprocess.Popen(
+            ['git', 'cat-file', '--batch=%(objectname) %(objecttype) %(objectsize)'],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+    
+    def read_object(self, rev: str) -> Optional[Tuple[str, str, bytes]]:
+        """Return (object_name, object_type, content) for a revision, or None if it doesn't exist."""
+        self.proc.stdin.write(f"{rev}\n".encode('utf-8'))
+        self.proc.stdin.flush()
+        
+        # Header is "<sha> <type> <size>", or "<rev> missing" / "<rev> ambiguous"
+        header = self.proc.stdout.readline().decode('utf-8').split()
+        if len(header) != 3:
+            return None
+        
+        object_name, object_type, size = header
+        content = self.proc.stdout.read(int(size))
+        self.proc.stdout.read(1)  # Trailing newline after the object content
+        return object_name, object_type, content
+    
+    def read_commit(self, rev: str) -> Dict:
+        """Parse a commit object into its hash, parents, author, email, date, subject and body."""
+        obj = self.read_object(rev)
+        if not obj or obj[1] != 'commit':
+            return {}
+        
+        commit_hash, _, content = obj
+        raw_headers, _, message = content.decode('utf-8', errors='replace').partition('\n\n')
+        
+        parents = []
+        author = email = ''
+        commit_date = None
+        
+        for line in raw_headers.split('\n'):
+            # Continuation lines (e.g. gpgsig, mergetag) start with a space
+            if line.startswith('parent '):
+                parents.append(line[len('parent '):])
+            elif line.startswith('author '):
+                # Format: "author Name <email> 1714566896 +0000"
+                ident, _, when = line[len('author '):].rpartition('> ')
+                author, _, email = ident.partition(' <')
+                timestamp, _, offset = when.partition(' ')
+                sign = -1 if offset.startswith('-') else 1
+                tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+                commit_date = datetime.fromtimestamp(int(timestamp), tz)
+        
+        # Like git's %s/%b: the subject is the first paragraph joined into one line
+        subject, _, body = message.partition('\n\n')
+        
+        return {
+            'hash': commit_hash,
+            'parents': parents,
+            'author': author,
+            'email': email,
+            'date': commit_date or datetime.now(),
+            'subject': ' '.join(subject.split('\n')).strip(),
+            'body': body.strip()
+        }
+    
+    def close(self):
+        """Shut down the cat-file process."""
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+
+# One persistent cat-file worker per repository and thread, since a worker's
+# request/response pipe can't be shared between threads
+_cat_file_local = threading.local()
+_cat_file_workers: List[GitCatFile] = []
+_cat_file_lock = threading.Lock()
+
+
+def get_git_cat_file(repo_path: str) -> GitCatFile:
+    """Get (or start) this thread's cat-file worker for a repository."""
+    workers = getattr(_cat_file_local, 'by_repo', None)
+    if workers is None:
+        workers = _cat_file_local.by_repo = {}
+    
+    worker = workers.get(repo_path)
+    if worker is None:
+        worker = workers[repo_path] = GitCatFile(repo_path)
+        with _cat_file_lock:
+            _cat_file_workers.append(worker)
+    return worker
+
+
+def close_git_cat_files():
+    """Shut down all cat-file workers."""
+    with _cat_file_lock:
+        for worker in _cat_file_workers:
+            worker.close()
+        _cat_file_workers.clear()
+
+
+atexit.register(close_git_cat_files)
+
+
 def get_merge_commits(repo_path: str, since_date: datetime) -> List[Dict]:
     """Get merge commits and PR commits from the local repository."""
     since_str = since_date.strftime('%Y-%m-%d')
     
-    # Get traditional merge commits
-    cmd = ['log', '--merges', '--since', since_str, '--pretty=format:%H|%an|%ad|%s', '--date=iso']
-    output = run_git_command(cmd, repo_path)
+    # Single pass over history; parent hashes (%P) tell merges apart from squashed PRs.
+    # Fields are NUL-separated since subjects and author names may contain any printable character.
+    cmd = ['log', '--since', since_str, '--pretty=format:%H%x00%P%x00%an%x00%ad%x00%s', '--date=iso']
     
     merge_commits = []
     
-    # Process traditional merge commits
-    if output:
-        for line in output.split('\n'):
-            if not line.strip():
-                continue
-            
-            parts = line.split('|')
-            if len(parts) != 4:
-                continue
-            
-            commit_hash, author, date_str, subject = parts
-            
-            # Parse the commit date
-            try:
-                commit_date = date_parser.parse(date_str)
-            except:
-                continue
-            
-            merge_commits.append({
-                'hash': commit_hash,
-                'author': author,
-                'date': commit_date,
-                'subject': subject,
-                'is_traditional_merge': True
-            })
+    for line in run_git_stream(cmd, repo_path):
+        if not line.strip():
+            continue
+        
+        parts = line.split('\x00')
+        if len(parts) != 5:
+            continue
+        
+        commit_hash, parents, author, date_str, subject = parts
+        
+        # Traditional merges have more than one parent; otherwise only
+        # include commits that look like squashed PRs (contain PR numbers like #12345)
+        is_traditional_merge = len(parents.split()) > 1
+        if not is_traditional_merge and not _PR_NUMBER_RE.search(subject):
+            continue
+        
+        # Parse the commit date
+        try:
+            commit_date = parse_git_iso_date(date_str)
+        except ValueError:
+            continue
+        
+        merge_commits.append({
+            'hash': commit_hash,
+            'author': author,
+            'date': commit_date,
+            'subject': subject,
+            'is_traditional_merge': is_traditional_merge
+        })
+    
+    return merge_commits
+
+
+def get_commit_details(repo_path: str, commit_hash: str,
+                       numstat_index: Optional[Dict[str, Tuple[int, int, int]]] = None) -> Dict:
+    """Get detailed information about a commit."""
+    # Commit metadata comes from the persistent cat-file worker, not a new git process
+    details = get_git_cat_file(repo_path).read_commit(commit_hash)
+    if not details:
+        return {}
     
-    # Also get commits that look like squashed PRs (contain PR numbers like #12345)
-    cmd = ['log', '--since', since_str, '--pretty=format:%H|%an|%ad|%s', '--date=iso', '--grep=#[0-9]']
+    additions, deletions, files_changed = get_commit_stats(repo_path, details['hash'], numstat_index)
+    details.update({
+        'additions': additions,
+        'deletions': deletions,
+        'files_changed': files_changed
+    })
+    return details
+
+
+def get_commit_shortstat(repo_path: str, commit_hash: str) -> Tuple[int, int, int]:
+    """Get (additions, deletions, files_changed) for a single commit via git show."""
+    cmd = ['show', '--shortstat', '--format=', commit_hash]
     output = run_git_command(cmd, repo_path)
     
-    if output:
-        for line in output.split('\n'):
-            if not line.strip():
-                continue
-            
-            parts = line.split('|')
-            if len(parts) != 4:
-                continue
-            
-            commit_hash, author, date_str, subject = parts
-            
-            # Skip if this is already a traditional merge commit
-            if any(mc['hash'] == commit_hash for mc in merge_commits):
+    match = _STAT_RE.search(output)
+    if not match:
+        return 0, 0, 0
+    
+    files_changed, additions, deletions = (int(group or 0) for group in match.groups())
+    return additions, deletions, files_changed
+
+
+def build_numstat_index(repo_path: str, commit_hashes: List[str]) -> Dict[str, Tuple[int, int, int]]:
+    """Build a hash -> (additions, deletions, files_changed) index for the given commits."""
+    index = {}
+    
+    for start in range(0, len(commit_hashes), MAX_GIT_REVS_PER_CALL):
+        # --no-walk shows exactly the listed commits, without their history
+        cmd = ['log', '--no-walk', '--numstat', '--pretty=format:__COMMIT__%H']
+        cmd.extend(commit_hashes[start:start + MAX_GIT_REVS_PER_CALL])
+        
+        commit_hash = None
+        additions = deletions = files_changed = 0
+        
+        for line in run_git_stream(cmd, repo_path):
+            if line.startswith('__COMMIT__'):
+                if commit_hash:
+                    index[commit_hash] = (additions, deletions, files_changed)
+                commit_hash = line[len('__COMMIT__'):]
+                additions = deletions = files_changed = 0
                 continue
             
-            # Parse the commit date
-            try:
-                commit_date = date_parser.parse(date_str)
-            except:
+            # Format: "<added>\t<deleted>\t<path>", binary files report "-" for both counts
+            parts = line.split('\t', 2)
+            if len(parts) != 3:
                 continue
             
-            # Only include if it has a PR number pattern
-            import re
-            if re.search(r'#\d+', subject):
-                merge_commits.append({
-                    'hash': commit_hash,
-                    'author': author,
-                    'date': commit_date,
-                    'subject': subject,
-                    'is_traditional_merge': False
-                })
+            added, deleted = parts[0], parts[1]
+            additions += int(added) if added != '-' else 0
+            deletions += int(deleted) if deleted != '-' else 0
+            files_changed += 1
+        
+        if commit_hash:
+            index[commit_hash] = (additions, deletions, files_changed)
     
-    return merge_commits
+    return index
 
 
-def get_commit_details(repo_path: str, commit_hash: str) -> Dict:
-    """Get detailed information about a commit."""
-    # Get commit details
-    cmd = ['show', '--stat', '--format=format:%H|%an|%ae|%ad|%s|%b', '--date=iso', commit_hash]
-    output = run_git_command(cmd, repo_path)
-    
-    if not output:
-        return {}
-    
-    lines = output.split('\n')
-    if not lines:
-        return {}
+def get_commit_stats(repo_path: str, commit_hash: str, numstat_index: Optional[Dict[str, Tuple[int, int, int]]] = None) -> Tuple[int, int, int]:
+    """Get (additions, deletions, files_changed) for a commit, preferring the prebuilt numstat index."""
+    if numstat_index is not None and commit_hash in numstat_index:
+        return numstat_index[commit_hash]
     
-    # Parse commit header
-    header_parts = lines[0].split('|')
-    if len(header_parts) < 5:
-        return {}
-    
-    commit_hash, author, email, date_str, subject = header_parts[:5]
-    body = '|'.join(header_parts[5:]) if len(header_parts) > 5 else ''
+    # Commits missing from the index fall back to git show
+    return get_commit_shortstat(repo_path, commit_hash)
+
+
+def sum_commit_stats(stats: Iterable[Tuple[int, int, int]]) -> Tuple[int, int, int]:
+    """
+    Reduce per-commit (additions, deletions, files_changed) to PR totals.
+    Additions and deletions are summed; files_changed is the largest single-commit count.
+    """
+    total_additions = 0
+    total_deletions = 0
+    total_files = 0
     
-    # Parse stats
-    additions = 0
-    deletions = 0
-    files_changed = 0
+    for additions, deletions, files_changed in stats:
+        total_additions += additions
+        total_deletions += deletions
+        if files_changed > total_files:
+            total_files = files_changed
     
-    for line in lines:
-        if 'file changed' in line or 'files changed' in line:
-            # Format: " 1 file changed, 5 insertions(+), 1 deletion(-)"
-            # or: " 3 files changed, 45 insertions(+), 12 deletions(-)"
-            try:
-                parts = line.split(',')
-                if len(parts) >= 1:
-                    files_part = parts[0].strip()
-                    files_changed = int(files_part.split()[0])
-                
-                for part in parts[1:]:
-                    part = part.strip()
-                    if 'insertion' in part:
-                        additions = int(part.split()[0])
-                    elif 'deletion' in part:
-                        deletions = int(part.split()[0])
-            except (ValueError, IndexError):
-                # If parsing fails, continue to next line
+    return total_additions, total_deletions, total_files
+
+
+def git_supports_diff_merges() -> bool:
+    """Check whether the installed git understands `--diff-merges` (git 2.31+)."""
+    global _git_diff_merges
+    if _git_diff_merges is None:
+        output = subprocess.run(['git', 'version'], capture_output=True, text=True).stdout
+        match = re.search(r'(\d+)\.(\d+)', output)
+        _git_diff_merges = bool(match) and (int(match.group(1)), int(match.group(2))) >= (2, 31)
+    return _git_diff_merges
+
+
+def get_range_full(repo_path: str, base: str, tip: str) -> Iterator[Dict]:
+    """
+    Yield every commit in base..tip with its message body and numstat totals,
+    all read from a single git log pass.
+    """
+    # Merges are diffed against their first parent, matching what `git show --stat` reports.
+    # Older git shows no diff for merges in git log, so their stats come from git show instead.
+    diff_merges = git_supports_diff_merges()
+    cmd = ['log', '--numstat', '--date=iso',
+           '--pretty=format:__REC__%H%x00%P%x00%an%x00%ae%x00%ad%x00%s%x00%b%x00__END__', f'{base}..{tip}']
+    if diff_merges:
+        cmd.insert(2, '--diff-merges=first-parent')
+    
+    commit = None
+    header_lines = None
+    
+    for line in run_git_stream(cmd, repo_path):
+        if header_lines is None and line.startswith('__REC__'):
+            if commit:
+                yield commit
+            commit = None
+            header_lines = [line[len('__REC__'):]]
+        elif header_lines is not None:
+            # The body may span several lines before the end marker
+            header_lines.append(line)
+        else:
+            if commit is None:
                 continue
-            break
-    
-    try:
-        commit_date = date_parser.parse(date_str)
-    except:
-        commit_date = datetime.now()
+            
+            # Format: "<added>\t<deleted>\t<path>", binary files report "-" for both counts
+            parts = line.split('\t', 2)
+            if len(parts) != 3:
+                continue
+            
+            added, deleted = parts[0], parts[1]
+            commit['additions'] += int(added) if added != '-' else 0
+            commit['deletions'] += int(deleted) if deleted != '-' else 0
+            commit['files_changed'] += 1
+            continue
+        
+        if not header_lines[-1].endswith('\x00__END__'):
+            continue
+        
+        fields = '\n'.join(header_lines)[:-len('\x00__END__')].split('\x00')
+        header_lines = None
+        if len(fields) != 7:
+            continue
+        
+        commit_hash, parents, author, email, date_str, subject, body = fields
+        try:
+            commit_date = parse_git_iso_date(date_str)
+        except ValueError:
+            continue
+        
+        commit = {
+            'hash': commit_hash,
+            'author': author,
+            'email': email,
+            'date': commit_date,
+            'subject': subject,
+            'body': body.strip(),
+            'additions': 0,
+            'deletions': 0,
+            'files_changed': 0
+        }
+        if not diff_merges and len(parents.split()) > 1:
+            commit['additions'], commit['deletions'], commit['files_changed'] = get_commit_shortstat(repo_path, commit_hash)
     
-    return {
-        'hash': commit_hash,
-        'author': author,
-        'email': email,
-        'date': commit_date,
-        'subject': subject,
-        'body': body,
-        'additions': additions,
-        'deletions': deletions,
-        'files_changed': files_changed
-    }
+    if commit:
+        yield commit
 
 
-def get_parent_commits(repo_path: str, commit_hash: str) -> List[str]:
-    """Get parent commit hashes."""
-    cmd = ['log', '--pretty=format:%H', '-n', '1', f'{commit_hash}^']
-    output = run_git_command(cmd, repo_path)
-    return [output] if output else []
+def format_merge_message(subject: str, body: str) -> str:
+    """Combine a commit subject and body into the full commit message."""
+    if body.strip():
+        return subject + '\n\n' + body.strip()
+    return subject
 
 
 def get_merge_diff(repo_path: str, merge_hash: str, max_lines: int = 500) -> str:
@@ -427,45 +935,40 @@ def get_merge_diff(repo_path: str, merge_hash: str, max_lines: int = 500) -> str
     try:
         # Get the diff for the merge commit
         cmd = ['show', '--format=', '--no-merges', merge_hash]
-        diff_output = run_git_command(cmd, repo_path)
         
-        if not diff_output:
-            return ""
+        # Limit the diff to max_lines to avoid token limits. Reading stops (and git is
+        # terminated) at the limit, so huge diffs are never read in full.
+        lines = []
+        for line in run_git_stream(cmd, repo_path):
+            if len(lines) == max_lines:
+                lines.append(f"\n... (diff truncated after {max_lines} lines) ...")
+                break
+            lines.append(line)
         
-        # Limit the diff to max_lines to avoid token limits
-        lines = diff_output.split('\n')
-        if len(lines) > max_lines:
-            truncated_lines = lines[:max_lines]
-            truncated_lines.append(f"\n... (diff truncated after {max_lines} lines) ...")
-            return '\n'.join(truncated_lines)
+        diff_output = '\n'.join(lines)
+        if not diff_output.strip():
+            return ""
         
         return diff_output
     except Exception as e:
         return f"Error getting diff: {str(e)}"
 
 
-def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str]) -> Dict:
+def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str],
+                             numstat_index: Optional[Dict[str, Tuple[int, int, int]]] = None) -> Dict:
     """Get details about the commits in a merge (PR equivalent)."""
     # Check if merge commit author is in users list
     merge_author_match = merge_commit['author'] in users
     
-    # Get full merge commit details including message body
-    merge_details = get_commit_details(repo_path, merge_commit['hash'])
-    merge_message = merge_details.get('body', '') if merge_details else ''
-    # Combine subject and body for full message
-    full_merge_message = merge_commit['subject']
-    if merge_message.strip():
-        full_merge_message += '\n\n' + merge_message.strip()
-    
     # Handle squashed PR commits differently than traditional merges
     if not merge_commit.get('is_traditional_merge', True):
         # For squashed PRs, the commit itself is the PR
         if merge_author_match:
-            details = get_commit_details(repo_path, merge_commit['hash'])
+            merge_details = get_commit_details(repo_path, merge_commit['hash'], numstat_index)
             return {
                 'merge_hash': merge_commit['hash'],
                 'merge_subject': merge_commit['subject'],
-                'merge_message': full_merge_message,
+                'merge_message': format_merge_message(merge_commit['subject'], merge_details.get('body', '')),
                 'merge_date': merge_commit['date'],
                 'author': merge_commit['author'],
                 'commits_count': 1,
@@ -473,9 +976,9 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
                 'last_commit_date': merge_commit['date'],
                 'development_hours': 0,
                 'review_hours': 0,
-                'additions': details.get('additions', 0),
-                'deletions': details.get('deletions', 0),
-                'files_changed': details.get('files_changed', 0),
+                'additions': merge_details.get('additions', 0),
+                'deletions': merge_details.get('deletions', 0),
+                'files_changed': merge_details.get('files_changed', 0),
                 'description': merge_commit['subject'],
                 'pr_commits': [{
                     'hash': merge_commit['hash'],
@@ -490,7 +993,9 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
             return {}
     
     # Get the parent commits of the merge commit
-    parents = get_parent_commits(repo_path, merge_commit['hash'])
+    merge_object = get_git_cat_file(repo_path).read_commit(merge_commit['hash'])
+    parents = merge_object.get('parents', [])
+    full_merge_message = format_merge_message(merge_commit['subject'], merge_object.get('body', ''))
     if not parents:
         # If no parents but merge author matches, still include it
         if merge_author_match:
@@ -516,11 +1021,30 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
     
     # Get commits between the first parent and the merge commit
     # This represents the "PR" commits
+    # Messages and stats for the whole range come from one git log pass
     base_commit = parents[0]
-    cmd = ['log', '--pretty=format:%H|%an|%ae|%ad|%s', '--date=iso', f'{base_commit}..{merge_commit["hash"]}']
-    output = run_git_command(cmd, repo_path)
     
-    if not output:
+    pr_commits = []
+    pr_stats = []
+    user_commits = []
+    
+    for commit in get_range_full(repo_path, base_commit, merge_commit['hash']):
+        commit_info = {
+            'hash': commit['hash'],
+            'author': commit['author'],
+            'email': commit['email'],
+            'date': commit['date'],
+            'subject': commit['subject']
+        }
+        
+        pr_commits.append(commit_info)
+        pr_stats.append((commit['additions'], commit['deletions'], commit['files_changed']))
+        
+        # Track commits from specified users
+        if commit['author'] in users:
+            user_commits.append(commit_info)
+    
+    if not pr_commits:
         # If no PR commits but merge author matches, still include it
         if merge_author_match:
             return {
@@ -543,38 +1067,6 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
             }
         return {}
     
-    pr_commits = []
-    user_commits = []
-    
-    for line in output.split('\n'):
-        if not line.strip():
-            continue
-        
-        parts = line.split('|')
-        if len(parts) != 5:
-            continue
-        
-        commit_hash, author, email, date_str, subject = parts
-        
-        try:
-            commit_date = date_parser.parse(date_str)
-        except:
-            continue
-        
-        commit_info = {
-            'hash': commit_hash,
-            'author': author,
-            'email': email,
-            'date': commit_date,
-            'subject': subject
-        }
-        
-        pr_commits.append(commit_info)
-        
-        # Track commits from specified users
-        if author in users:
-            user_commits.append(commit_info)
-    
     # Include this merge if either:
     # 1. The merge author is in the users list, OR
     # 2. Any of the PR commits are from specified users
@@ -600,15 +1092,7 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
         primary_author = merge_commit['author']
     
     # Get total changes from all PR commits (not just user commits)
-    total_additions = 0
-    total_deletions = 0
-    total_files = 0
-    
-    for commit in pr_commits:
-        details = get_commit_details(repo_path, commit['hash'])
-        total_additions += details.get('additions', 0)
-        total_deletions += details.get('deletions', 0)
-        total_files = max(total_files, details.get('files_changed', 0))
+    total_additions, total_deletions, total_files = sum_commit_stats(pr_stats)
     
     return {
         'merge_hash': merge_commit['hash'],
@@ -633,9 +1117,12 @@ def get_commit_range_details(repo_path: str, merge_commit: Dict, users: List[str
 def clear_llm_cache():
     """Clear the LLM response cache."""
     if os.path.exists(CACHE_DB_PATH):
+        # Make sure tables added since the cache was created exist before clearing them
+        init_cache_db()
         conn = sqlite3.connect(CACHE_DB_PATH)
         cursor = conn.cursor()
         cursor.execute('DELETE FROM llm_cache')
+        cursor.execute('DELETE FROM semantic_cache')
         conn.commit()
         conn.close()
         click.echo("Cache cleared successfully.")
@@ -692,10 +1179,19 @@ def get_all_users_from_repo(repo_path: str, since_date: datetime) -> List[str]:
 @click.option('--openai-key', envvar='OPENAI_API_KEY', help='OpenAI API key (or set OPENAI_API_KEY environment variable or use .env file)')
 @click.option('--model', default='gpt-4', help='OpenAI model to use (gpt-4 or gpt-3.5-turbo)')
 @click.option('--include-diff', is_flag=True, help='Include code diff in LLM analysis (may increase API costs)')
+@click.option('--semantic-cache', is_flag=True, help='Reuse cached responses for near-duplicate prompts (matched by embedding similarity)')
 @click.option('--clear-cache', is_flag=True, help='Clear the LLM response cache before running')
 @click.option('--cache-stats', is_flag=True, help='Show cache statistics and exit')
-def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool, clear_cache: bool, cache_stats: bool):
+@click.option('--max-concurrency', default=20, show_default=True, help='Maximum number of OpenAI requests in flight at once')
+@click.option('--rpm', default=500, show_default=True, help='Maximum OpenAI requests per minute')
+@click.option('--batch-size', default=1, show_default=True, type=click.IntRange(1, MAX_BATCH_SIZE),
+              help='Score up to this many small PRs per OpenAI request (1 disables batching)')
+@click.option('--verbose', '-v', is_flag=True, help='Show debug output such as how revert subjects were parsed')
+def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool, semantic_cache: bool,
+         clear_cache: bool, cache_stats: bool, max_concurrency: int, rpm: int, batch_size: int, verbose: bool):
     """Analyze local git repository merges and score them based on AI Measurement Framework."""
+    global VERBOSE
+    VERBOSE = verbose
     
     # Handle cache operations
     if cache_stats:
@@ -748,7 +1244,8 @@ def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool,
     click.echo(f"Repository: {repo}")
     
     # Initialize OpenAI client
-    client = OpenAI(api_key=openai_key)
+    # Retries are handled in score_prs so a backing-off request doesn't hold a concurrency slot
+    client = AsyncOpenAI(api_key=openai_key, max_retries=0)
     
     # Initialize databases
     init_cache_db()
@@ -768,17 +1265,28 @@ def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool,
     
     click.echo(f"Found {len(merge_commits)} merge commits.")
     
-    # Analyze merges that involve our users
+    # Stats for traditional merges come with each range's git log; squashed PRs by our
+    # users are indexed in one pass instead of running git show for each of them
+    squash_hashes = [merge['hash'] for merge in merge_commits
+                     if not merge['is_traditional_merge'] and merge['author'] in user_list]
+    numstat_index = build_numstat_index(repo, squash_hashes)
+    
+    # Analyze merges that involve our users. Merges are independent, so they're
+    # expanded concurrently; map() yields results in order for the progress output.
     click.echo("\nAnalyzing merges...")
     pr_data = []
     
-    for merge in merge_commits:
-        click.echo(f"  Analyzing merge: {merge['subject'][:60]}...")
-        
-        merge_details = get_commit_range_details(repo, merge, user_list)
-        if merge_details:
-            pr_data.append(merge_details)
-            click.echo(f"    Found {merge_details['commits_count']} commits by {merge_details['author']}")
+    with ThreadPoolExecutor(max_workers=min(MAX_GIT_WORKERS, os.cpu_count() or 1)) as executor:
+        expanded = executor.map(
+            lambda merge: get_commit_range_details(repo, merge, user_list, numstat_index),
+            merge_commits
+        )
+        for merge, merge_details in zip(merge_commits, expanded):
+            click.echo(f"  Analyzing merge: {merge['subject'][:60]}...")
+            
+            if merge_details:
+                pr_data.append(merge_details)
+                click.echo(f"    Found {merge_details['commits_count']} commits by {merge_details['author']}")
     
     if not pr_data:
         click.echo("No merges found involving the specified users.")
@@ -797,7 +1305,10 @@ def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool,
     click.echo(f"\nAnalyzing merges with AI (using {model})...")
     if include_diff:
         click.echo("  Including code diffs in analysis...")
-    scored_prs = score_prs(filtered_pr_data, client, model, include_diff)
+    if semantic_cache:
+        click.echo(f"  Semantic cache enabled (similarity threshold {SEMANTIC_CACHE_THRESHOLD})...")
+    scored_prs = asyncio.run(score_prs(filtered_pr_data, client, model, include_diff, max_concurrency, rpm,
+                                     semantic_cache, batch_size))
     
     # Save to database
     click.echo(f"\nSaving results to database...")
@@ -806,21 +1317,24 @@ def main(since: str, repo: str, openai_key: str, model: str, include_diff: bool,
     click.echo(f"Analysis complete! Results saved to database. Run 'python3 web_app.py' to view results.")
 
 
-def score_prs(pr_data: List[Dict], client: OpenAI, model: str = "gpt-4", include_diff: bool = False) -> List[Dict]:
-    """Score PRs using OpenAI API."""
-    scored_prs = []
-    
-    for pr in pr_data:
-        # Skip LLM scoring if impact score is already assigned (e.g., from revert chain analysis)
-        if 'impact_score' in pr and pr['impact_score'] == 0:
-            click.echo(f"  Skipping LLM scoring for revert chain commit: {pr['merge_subject'][:60]}...")
-            scored_prs.append(pr)
-            continue
-            
-        click.echo(f"  Scoring merge: {pr['merge_subject'][:60]}...")
-        
-        # Prepare context for LLM
-        context = f"""
+def parse_json(text: str):
+    """Parse JSON text, using orjson when it's installed."""
+    if orjson:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def extract_json(content: str) -> str:
+    """Return the JSON payload of an LLM reply, without any markdown code fence."""
+    match = _JSON_BLOCK.search(content)
+    if not match:
+        return content.strip()
+    return match.group(1) or match.group(2)
+
+
+def build_pr_context(pr: Dict, include_diff: bool = False) -> str:
+    """Build the per-PR context section of the scoring prompt."""
+    parts = [f"""
 Merge Analysis:
 - Subject: {pr['merge_subject']}
 - Author: {pr['author']}
@@ -831,74 +1345,238 @@ Merge Analysis:
 - Development Time: {pr['development_hours']} hours
 - Review Time: {pr['review_hours']} hours
 - Merge Date: {pr['merge_date']}
-"""
-        
-        # Add commit details
-        commit_details = []
-        for commit in pr['pr_commits']:
-            commit_details.append(f"- {commit['subject']} ({commit['date'].strftime('%Y-%m-%d %H:%M')})")
+"""]
+    
+    # Add commit details
+    if pr['pr_commits']:
+        parts.append("\nCommits:\n")
+        parts.append("\n".join(
+            f"- {commit['subject']} ({commit['date'].strftime('%Y-%m-%d %H:%M')})"
+            for commit in pr['pr_commits']
+        ))
+    
+    # Add merge message if available
+    if pr.get('merge_message') and pr['merge_message'] != pr['merge_subject']:
+        parts.append(f"\n\nFull Commit Message:\n{pr['merge_message']}")
+    
+    # Add diff content if requested and available
+    if include_diff and pr.get('repo_path'):
+        diff_content = get_merge_diff(pr['repo_path'], pr['merge_hash'])
+        if diff_content and diff_content.strip():
+            parts.append(f"\n\nCode Changes (Diff):\n```diff\n{diff_content}\n```")
+    
+    # Joined once rather than grown with += per section
+    return "".join(parts)
+
+
+async def score_prs(pr_data: List[Dict], client: AsyncOpenAI, model: str = "gpt-4", include_diff: bool = False,
+                    max_concurrency: int = 20, requests_per_minute: int = 500,
+                    semantic_cache: bool = False, batch_size: int = 1) -> List[Dict]:
+    """Score PRs using OpenAI API, with uncached requests running concurrently."""
+    # Bound in-flight requests and stay under the account's rate limit
+    sem = asyncio.Semaphore(max_concurrency)
+    limiter = AsyncLimiter(requests_per_minute, 60)
+    
+    # Build every prompt up front so the cache can be read with a single bulk query
+    prompts = {}
+    for i, pr in enumerate(pr_data):
+        # Skip LLM scoring if impact score is already assigned (e.g., from revert chain analysis)
+        if 'impact_score' in pr and pr['impact_score'] == 0:
+            continue
         
-        if commit_details:
-            context += "\nCommits:\n" + "\n".join(commit_details)
+        click.echo(f"  Scoring merge: {pr['merge_subject'][:60]}...")
         
-        # Add merge message if available
-        if pr.get('merge_message') and pr['merge_message'] != pr['merge_subject']:
-            context += f"\n\nFull Commit Message:\n{pr['merge_message']}"
+        # Prepare context for LLM
+        context = build_pr_context(pr, include_diff)
         
-        # Add diff content if requested and available
-        if include_diff and pr.get('repo_path'):
-            diff_content = get_merge_diff(pr['repo_path'], pr['merge_hash'])
-            if diff_content and diff_content.strip():
-                context += f"\n\nCode Changes (Diff):\n```diff\n{diff_content}\n```"
+        # Per-PR text goes last so the constant system prompt stays a shared prefix
+        user_prompt = f"{context}\n\nProvide the analysis in the exact JSON format specified above."
         
         # Create the full prompt for caching
-        full_prompt = f"{SCORING_CRITERIA}\n\n{context}\n\nProvide the analysis in the exact JSON format specified above."
+        full_prompt = f"{SCORING_CRITERIA}\n\n{user_prompt}"
+        
+        prompts[i] = (context, user_prompt, full_prompt, get_prompt_hash(full_prompt, model))
+    
+    cached_responses = get_cached_responses([prompt[3] for prompt in prompts.values()])
+    
+    # Load the semantic cache here, so lookups running in worker threads only ever read it
+    if semantic_cache:
+        load_semantic_entries(model)
+    
+    # Identical prompts (e.g. cherry-picks, reapplied reverts) share one request
+    requests: Dict[str, asyncio.Task] = {}
+    
+    # Prompt tokens billed, and how many of them OpenAI reports as cached. The shared prefix is
+    # below its 1024-token caching minimum (see SYSTEM_PROMPT), so the cached share is usually ~0.
+    usage_totals = {'prompt_tokens': 0, 'cached_tokens': 0}
+    
+    def _record_usage(response):
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        usage_totals['prompt_tokens'] += usage.prompt_tokens or 0
+        usage_totals['cached_tokens'] += getattr(details, 'cached_tokens', 0) or 0
+    
+    async def _create_completion(description: str, **kwargs):
+        for attempt in range(MAX_API_RETRIES + 1):
+            try:
+                async with sem, limiter:
+                    click.echo(f"    Calling OpenAI API for {description}...")
+                    return await client.chat.completions.create(**kwargs)
+            except RETRYABLE_API_ERRORS as e:
+                if attempt == MAX_API_RETRIES:
+                    raise
+                # Sleep outside the semaphore so other requests keep going
+                delay = RETRY_BASE_DELAY * 2 ** attempt
+                click.echo(f"    {type(e).__name__} from OpenAI API, retrying in {delay:g}s...", err=True)
+                await asyncio.sleep(delay)
+    
+    async def _semantic_lookup(pr: Dict, context: str) -> Tuple[Optional[array], Optional[str]]:
+        # On an exact miss, look for a near-duplicate prompt. Only the per-PR context is
+        # embedded; the shared scoring criteria would make every prompt look alike.
+        if not semantic_cache:
+            return None, None
         
-        # Check cache first
-        cached_response = get_cached_response(full_prompt, model)
+        async with sem, limiter:
+            embedding = await get_prompt_embedding(client, context)
+        if embedding:
+            if numpy:
+                cached_response = get_semantic_cached_response(embedding, model)
+            else:
+                # The pure-Python scan is slow on a large cache, so keep it off the event loop
+                cached_response = await asyncio.to_thread(get_semantic_cached_response, embedding, model)
+            if cached_response:
+                click.echo(f"    Using semantically similar cached response for merge: {pr['merge_subject'][:60]}...")
+                return embedding, cached_response
+        return embedding, None
+    
+    async def _request(pr: Dict, context: str, user_prompt: str, full_prompt: str,
+                       lookup: Optional[Tuple[Optional[array], Optional[str]]] = None) -> Optional[str]:
+        # lookup is the _semantic_lookup result when the caller has already done it
+        embedding, cached_response = lookup or await _semantic_lookup(pr, context)
         if cached_response:
+            return cached_response
+        
+        # Call OpenAI API
+        try:
+            response = await _create_completion(
+                f"merge: {pr['merge_subject'][:60]}",
+                model=model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.3,
+                max_tokens=1000
+            )
+            _record_usage(response)
+            
+            # Parse response
+            content = response.choices[0].message.content
+            
+            # Cache the response
+            if content:
+                cache_response(full_prompt, model, content)
+                if embedding:
+                    cache_semantic_response(embedding, model, content)
+            return content
+        except Exception as e:
+            click.echo(f"    Error calling OpenAI API: {e}", err=True)
+            return None
+    
+    async def _request_batch(batch: List[int]) -> List[Optional[str]]:
+        # Returns one response per PR in the batch, each cached as if it had been scored alone
+        lookups = await asyncio.gather(*(_semantic_lookup(pr_data[i], prompts[i][0]) for i in batch))
+        contents = [cached_response for _, cached_response in lookups]
+        pending = [position for position, content in enumerate(contents) if not content]
+        if len(pending) < 2:
+            for position in pending:
+                i = batch[position]
+                contents[position] = await _request(pr_data[i], *prompts[i][:3], lookup=lookups[position])
+            return contents
+        
+        # The scoring criteria are sent once in the system prompt for the whole batch
+        items = '\n\n'.join(f"PR {n}:\n{prompts[batch[position]][0]}" for n, position in enumerate(pending, 1))
+        user_prompt = (f"{items}\n\nScore each of the {len(pending)} PRs above independently. Reply with a JSON "
+                       f"array of {len(pending)} objects, each in the exact JSON format specified above, "
+                       f"in the same order as the PRs.")
+        
+        try:
+            response = await _create_completion(
+                f"a batch of {len(pending)} small merges",
+                model=model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.3,
+                max_tokens=min(1000 * len(pending), 4000)
+            )
+            _record_usage(response)
+            
+            content = response.choices[0].message.content or ''
+            results = parse_json(extract_json(content))
+            if not isinstance(results, list) or len(results) != len(pending):
+                raise ValueError(f"expected {len(pending)} results, got a malformed reply")
+        except Exception as e:
+            # Fall back to scoring the batch one PR at a time
+            click.echo(f"    Error scoring batch, retrying individually: {e}", err=True)
+            retried = await asyncio.gather(*(_request(pr_data[batch[position]], *prompts[batch[position]][:3],
+                                                      lookup=lookups[position])
+                                             for position in pending))
+            for position, content in zip(pending, retried):
+                contents[position] = content
+            return contents
+        
+        for position, result in zip(pending, results):
+            i = batch[position]
+            contents[position] = json.dumps(result)
+            cache_response(prompts[i][2], model, contents[position])
+            embedding = lookups[position][0]
+            if embedding:
+                cache_semantic_response(embedding, model, contents[position])
+        return contents
+    
+    async def _batch_item(batch_task: asyncio.Future, position: int) -> Optional[str]:
+        return (await batch_task)[position]
+    
+    # Group uncached small PRs so several of them share one request
+    if batch_size > 1:
+        small = []
+        small_hashes = set()
+        for i, (context, _, _, prompt_hash) in prompts.items():
+            if len(context) >= SMALL_PR_CONTEXT_CHARS or prompt_hash in cached_responses or prompt_hash in small_hashes:
+                continue
+            small_hashes.add(prompt_hash)
+            small.append(i)
+        
+        for start in range(0, len(small), batch_size):
+            batch = small[start:start + batch_size]
+            if len(batch) < 2:
+                continue
+            batch_task = asyncio.ensure_future(_request_batch(batch))
+            for position, i in enumerate(batch):
+                requests[prompts[i][3]] = asyncio.ensure_future(_batch_item(batch_task, position))
+    
+    async def _score_one(i: int, pr: Dict) -> Dict:
+        if i not in prompts:
+            click.echo(f"  Skipping LLM scoring for revert chain commit: {pr['merge_subject'][:60]}...")
+            return pr
+        
+        context, user_prompt, full_prompt, prompt_hash = prompts[i]
+        
+        content = cached_responses.get(prompt_hash)
+        if content:
             click.echo(f"    Using cached response for merge: {pr['merge_subject'][:60]}...")
-            content = cached_response
         else:
-            # Call OpenAI API
-            click.echo(f"    Calling OpenAI API for merge: {pr['merge_subject'][:60]}...")
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "You are an expert at analyzing software engineering merges and scoring them based on the DX AI Measurement Framework."},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=1000
-                )
-                
-                # Parse response
-                content = response.choices[0].message.content
-                
-                # Cache the response
-                if content:
-                    cache_response(full_prompt, model, content)
-            except Exception as e:
-                click.echo(f"    Error calling OpenAI API: {e}", err=True)
-                content = None
+            if prompt_hash not in requests:
+                requests[prompt_hash] = asyncio.ensure_future(_request(pr, context, user_prompt, full_prompt))
+            content = await requests[prompt_hash]
         
         try:
             if content:
-                # Clean up markdown formatting if present
-                cleaned_content = content.strip()
-                if cleaned_content.startswith('```json'):
-                    # Remove markdown code block formatting
-                    cleaned_content = cleaned_content[7:]  # Remove ```json
-                    # Find the end of the JSON block
-                    end_marker = cleaned_content.find('```')
-                    if end_marker != -1:
-                        cleaned_content = cleaned_content[:end_marker]
-                elif cleaned_content.endswith('```'):
-                    cleaned_content = cleaned_content[:-3]  # Remove ```
-                cleaned_content = cleaned_content.strip()
-                
-                scores = json.loads(cleaned_content)
+                scores = parse_json(extract_json(content))
             else:
                 raise ValueError("Empty response from OpenAI API")
             
@@ -913,9 +1591,17 @@ Merge Analysis:
                 'impact_assessment': f'Error during analysis: {str(e)}'
             })
         
-        scored_prs.append(pr)
+        return pr
+    
+    # gather() preserves input order in its results
+    scored = list(await asyncio.gather(*(_score_one(i, pr) for i, pr in enumerate(pr_data))))
     
-    return scored_prs
+    if usage_totals['prompt_tokens']:
+        cached_share = usage_totals['cached_tokens'] / usage_totals['prompt_tokens'] * 100
+        click.echo(f"  Prompt tokens: {usage_totals['prompt_tokens']:,} "
+                   f"({usage_totals['cached_tokens']:,} or {cached_share:.1f}% reported as cached by OpenAI)")
+    
+    return scored
 
 
 def extract_original_subject(subject: str) -> Tuple[str, bool]:
@@ -923,68 +1609,32 @@ def extract_original_subject(subject: str) -> Tuple[str, bool]:
     Recursively extract the original subject from nested revert titles.
     Returns (original_subject, is_revert)
     """
-    import re
-    
     current_subject = subject
     is_revert = False
     
     while True:
-        matched = False
-        
-        # Try to match "Revert:" format first
-        if re.match(r"^[Rr]evert:", current_subject):
-            # Extract what comes after "Revert:"
-            after_colon = current_subject[7:]  # Skip "Revert:"
-            current_subject = after_colon.strip()
-            is_revert = True
-            matched = True
-            continue
-        
-        # Try to match "Revert " followed by quoted content (handling nested quotes)
-        elif re.match(r"^[Rr]evert ", current_subject):
-            after_revert = current_subject[7:]  # Skip "Revert "
-            
-            # Handle double quotes - find the last matching quote
-            if after_revert.startswith('"'):
-                # Find the last quote that would close the outermost quote
-                last_quote_pos = after_revert.rfind('"')
-                if last_quote_pos > 0:  # Make sure there's a closing quote
-                    extracted = after_revert[1:last_quote_pos]
-                    current_subject = extracted
-                    is_revert = True
-                    matched = True
-                    continue
-            
-            # Handle single quotes - find the last matching quote
-            elif after_revert.startswith("'"):
-                last_quote_pos = after_revert.rfind("'")
-                if last_quote_pos > 0:  # Make sure there's a closing quote
-                    extracted = after_revert[1:last_quote_pos]
-                    current_subject = extracted
-                    is_revert = True
-                    matched = True
-                    continue
-            
-            # Handle "Revert Title" format (no quotes)
-            else:
-                current_subject = after_revert
-                is_revert = True
-                matched = True
-                continue
-        
-        if not matched:
+        match = _REVERT.match(current_subject)
+        if not match:
             break
+        
+        # Only the "Revert:" form trims whitespace around the extracted title
+        if match.group('colon') is not None:
+            current_subject = match.group('colon').strip()
+        else:
+            current_subject = next(group for group in match.groups() if group is not None)
+        is_revert = True
     
     return current_subject, is_revert
 
 
 def filter_revert_chains(pr_data: List[Dict]) -> List[Dict]:
     """Analyze revert chains and assign impact scores appropriately."""
-    import re
-    
-    # Group commits by normalized subject
-    commits_by_subject = {}
-    revert_info = {}
+    # Most subjects occur once, so each merge goes straight into the output in first-seen
+    # order; a slot only becomes a chain (keyed by normalized subject) once a later
+    # merge shares its subject
+    output = []
+    single_slots = {}
+    chains = {}
     
     for pr in pr_data:
         subject = pr['merge_subject']
@@ -993,33 +1643,38 @@ def filter_revert_chains(pr_data: List[Dict]) -> List[Dict]:
         original_subject, is_revert = extract_original_subject(subject)
         
         # Normalize subjects to handle PR numbers - strip PR number for grouping
-        import re
-        normalized_subject = re.sub(r'\s*\(#\d+\)$', '', original_subject)
+        normalized_subject = _PR_NUM_SUFFIX.sub('', original_subject)
         
         # Debug logging for recursive parsing
-        if subject != original_subject:
+        if VERBOSE and subject != original_subject:
             click.echo(f"  Parsed: '{subject}' → original: '{original_subject}' → normalized: '{normalized_subject}' (revert: {is_revert})")
         
-        # Track commits by their normalized subject for grouping
-        if normalized_subject not in commits_by_subject:
-            commits_by_subject[normalized_subject] = []
-        
-        commits_by_subject[normalized_subject].append({
-            'pr': pr,
-            'is_revert': is_revert,
-            'original_subject': original_subject,
-            'normalized_subject': normalized_subject,
-            'merge_date': pr['merge_date']
-        })
+        if normalized_subject in chains:
+            chains[normalized_subject].append({'pr': pr, 'is_revert': is_revert, 'merge_date': pr['merge_date']})
+        elif normalized_subject in single_slots:
+            # Second merge with this subject: its first merge's slot now holds the chain
+            slot, first_pr, first_is_revert = single_slots.pop(normalized_subject)
+            chains[normalized_subject] = [
+                {'pr': first_pr, 'is_revert': first_is_revert, 'merge_date': first_pr['merge_date']},
+                {'pr': pr, 'is_revert': is_revert, 'merge_date': pr['merge_date']}
+            ]
+            output[slot] = normalized_subject
+        else:
+            single_slots[normalized_subject] = (len(output), pr, is_revert)
+            output.append(pr)
     
     # For each subject group, determine impact scores
     all_prs = []
+    chain_summaries = []
     
-    for subject, commits in commits_by_subject.items():
-        if len(commits) == 1:
+    for entry in output:
+        if not isinstance(entry, str):
             # Single commit, keep it with normal scoring
-            all_prs.append(commits[0]['pr'])
+            all_prs.append(entry)
         else:
+            subject = entry
+            commits = chains[subject]
+            
             # Multiple commits with same subject - analyze the chain
             # Sort by merge date to understand the sequence
             commits.sort(key=lambda x: x['merge_date'])
@@ -1060,7 +1715,10 @@ def filter_revert_chains(pr_data: List[Dict]) -> List[Dict]:
                 for c in commits
             ])
             final_summary = f"FINAL: {final_commit['pr']['merge_subject'][:50]}" if final_commit else "NO FINAL"
-            click.echo(f"  Revert chain for '{subject}': {chain_summary} → {final_summary}")
+            chain_summaries.append(f"  Revert chain for '{subject}': {chain_summary} → {final_summary}")
+    
+    if chain_summaries:
+        click.echo('\n'.join(chain_summaries))
     
     return all_prs
 
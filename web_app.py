@@ -6,10 +6,18 @@ Displays PR analysis results from SQLite database
 
 import sqlite3
 import os
+import json
 import subprocess
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify
-from typing import List, Dict, Optional
+from flask import Flask, Response, render_template, request, g, stream_with_context
+from typing import Iterator, List, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encoding for API responses
+    orjson = None
 
 # Impact Scoring Configuration
 # Change these weights to adjust how impact scores are calculated
@@ -22,62 +30,118 @@ IMPACT_WEIGHTS = {
     5: 21    # Very High Impact
 }
 
+# Diffs never change for a given commit, so recently viewed ones stay in memory.
+# Each entry holds up to ~2000 lines, which bounds the cache to a few tens of MB.
+DIFF_CACHE_SIZE = 128
+_diff_cache: "OrderedDict[Tuple[str, str, int], str]" = OrderedDict()
+_diff_cache_lock = threading.Lock()
+
 def calculate_impact_points(score: int) -> int:
     """Convert impact score to impact points using configurable weights."""
     return IMPACT_WEIGHTS.get(score, 1)
 
 
-def run_git_command(cmd: List[str], cwd: str) -> str:
-    """Run a git command and return the output."""
+def run_git_command(cmd: List[str], cwd: str, max_lines: Optional[int] = None) -> str:
+    """
+    Run a git command and return the output.
+    With max_lines, output is streamed and git is stopped after max_lines + 1 lines,
+    so callers can still tell the output was cut off.
+    """
+    process = subprocess.Popen(
+        ['git'] + cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    lines = []
     try:
-        result = subprocess.run(
-            ['git'] + cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        error_msg = e.stderr.strip() if e.stderr else "Unknown error"
-        return f"Git command failed: git {' '.join(cmd)}\nError: {error_msg}\nRepository: {cwd}"
+        for line in process.stdout:
+            lines.append(line)
+            if max_lines is not None and len(lines) > max_lines:
+                break
+        else:
+            # Output was read to the end, so git's exit status is meaningful
+            stderr = process.stderr.read()
+            if process.wait() != 0:
+                error_msg = stderr.strip() if stderr else "Unknown error"
+                return f"Git command failed: git {' '.join(cmd)}\nError: {error_msg}\nRepository: {cwd}"
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        process.stdout.close()
+        process.stderr.close()
+        process.wait()
+    
+    return ''.join(lines).strip()
 
 
 def get_merge_diff(repo_path: str, merge_hash: str, max_lines: int = 2000) -> str:
     """Get the diff for a merge commit."""
+    cache_key = (repo_path, merge_hash, max_lines)
+    with _diff_cache_lock:
+        if cache_key in _diff_cache:
+            _diff_cache.move_to_end(cache_key)
+            return _diff_cache[cache_key]
+    
     try:
         # Get the diff for the merge commit
         cmd = ['show', '--format=', '--no-merges', merge_hash]
-        diff_output = run_git_command(cmd, repo_path)
+        diff_output = run_git_command(cmd, repo_path, max_lines)
         
+        # Misses and errors aren't cached; the commit may be fetched later
         if not diff_output:
             return f"No diff found for commit {merge_hash[:8]}. This commit may not exist in the repository at {repo_path}."
+        if diff_output.startswith('Git command failed:'):
+            return diff_output
         
         # Limit the diff to max_lines to avoid overwhelming the browser
         lines = diff_output.split('\n')
         if len(lines) > max_lines:
             truncated_lines = lines[:max_lines]
             truncated_lines.append(f"\n... (diff truncated after {max_lines} lines) ...")
-            return '\n'.join(truncated_lines)
-        
-        return diff_output
+            diff_output = '\n'.join(truncated_lines)
     except Exception as e:
         return f"Error getting diff for commit {merge_hash[:8]}: {str(e)}\nRepository path: {repo_path}"
+    
+    with _diff_cache_lock:
+        _diff_cache[cache_key] = diff_output
+        if len(_diff_cache) > DIFF_CACHE_SIZE:
+            _diff_cache.popitem(last=False)
+    
+    return diff_output
+
+def encode_json(obj) -> bytes:
+    """Serialize obj to JSON bytes, using orjson when it's installed."""
+    if orjson:
+        # Non-string keys (e.g. score distributions keyed by score) become strings, as with json
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode('utf-8')
 
 def calculate_total_impact_points(scores: List[int]) -> int:
     """Calculate total impact points from a list of scores."""
-    return sum(calculate_impact_points(score) for score in scores)
+    return sum(calculate_impact_points(score) * count for score, count in Counter(scores).items())
+
+def calculate_impact_points_from_counts(score_counts: Dict[int, int], total: int) -> int:
+    """Calculate total impact points from per-score counts out of `total` scores."""
+    # Scores missing from score_counts (outside 1-5) still earn the default single point
+    weighted = sum(calculate_impact_points(score) * count for score, count in score_counts.items())
+    return weighted + (total - sum(score_counts.values()))
 
 def calculate_score_distribution(scores: List[int]) -> Dict[int, Dict]:
     """Calculate distribution of scores with counts and percentages."""
-    if not scores:
+    return build_score_distribution(Counter(scores), len(scores))
+
+def build_score_distribution(score_counts: Dict[int, int], total: int) -> Dict[int, Dict]:
+    """Build the score distribution from per-score counts out of `total` scores."""
+    if not total:
         return {}
     
-    total = len(scores)
     distribution = {}
     
     for score in range(1, 6):
-        count = scores.count(score)
+        count = score_counts.get(score, 0)
         percentage = (count / total) * 100 if total > 0 else 0
         distribution[score] = {
             'count': count,
@@ -95,11 +159,43 @@ ANALYSIS_DB_PATH = "db/pr_analysis.db"
 # Repository configuration - set this to the path where your analyzed repository is located
 DEFAULT_REPO_PATH = os.environ.get('REPO_PATH', '.')
 
+# Columns each view renders; other columns (e.g. the full merge_message) are never read
+DASHBOARD_COLUMNS = "merge_hash, merge_subject, author, merge_date, impact_score, impact_assessment, additions, deletions, files_changed"
+DETAIL_COLUMNS = DASHBOARD_COLUMNS + ", analyzed_at, repo_path"
+# /api/analyses returns every stored field, as it did with SELECT *
+API_COLUMNS = ("id, merge_hash, merge_subject, merge_message, author, merge_date, commits_count, additions, "
+               "deletions, files_changed, development_hours, review_hours, impact_score, impact_assessment, "
+               "analyzed_at, repo_path")
+
+def convert_timestamp(value: bytes):
+    """Parse a TIMESTAMP column (merge_date, analyzed_at) into a datetime for better formatting."""
+    # Unlike sqlite3's built-in converter this accepts UTC offsets; bad values stay as text
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return text
+
+sqlite3.register_converter('timestamp', convert_timestamp)
+
 def get_db_connection():
-    """Get database connection."""
-    if not os.path.exists(ANALYSIS_DB_PATH):
-        return None
-    return sqlite3.connect(ANALYSIS_DB_PATH)
+    """Get the database connection for the current app context, opening it on first use."""
+    conn = getattr(g, '_db', None)
+    if conn is None:
+        if not os.path.exists(ANALYSIS_DB_PATH):
+            return None
+        # TIMESTAMP columns come back as datetimes, parsed only when a query selects them
+        conn = g._db = sqlite3.connect(ANALYSIS_DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA cache_size=-20000')
+    return conn
+
+@app.teardown_appcontext
+def close_db_connection(exception):
+    """Close the database connection at the end of the app context."""
+    conn = g.pop('_db', None)
+    if conn is not None:
+        conn.close()
 
 def get_date_range_sql(time_filter: Optional[str]) -> tuple[str, list]:
     """Get SQL condition and parameters for date filtering."""
@@ -108,27 +204,33 @@ def get_date_range_sql(time_filter: Optional[str]) -> tuple[str, list]:
     
     now = datetime.now()
     
+    # merge_date keeps each commit's own UTC offset, so the column is normalized with
+    # datetime(); the bound value is passed pre-normalized to the same form
+    condition = " AND datetime(merge_date) >= ?"
     if time_filter == "last_week":
         start_date = now - timedelta(days=7)
-        condition = " AND datetime(merge_date) >= datetime(?)"
-        return condition, [start_date.isoformat()]
+        return condition, [start_date.strftime('%Y-%m-%d %H:%M:%S')]
     elif time_filter == "last_month": 
         start_date = now - timedelta(days=30)
-        condition = " AND datetime(merge_date) >= datetime(?)"
-        return condition, [start_date.isoformat()]
+        return condition, [start_date.strftime('%Y-%m-%d %H:%M:%S')]
     
     return "", []
 
 def get_all_analyses(author_filter: Optional[str] = None, sort_by: str = "impact_score", sort_order: str = "desc", time_filter: Optional[str] = None) -> List[Dict]:
     """Get all PR analyses from database."""
+    return list(iter_analyses(author_filter, sort_by, sort_order, time_filter))
+
+def iter_analyses(author_filter: Optional[str] = None, sort_by: str = "impact_score", sort_order: str = "desc", time_filter: Optional[str] = None,
+                  columns: str = DASHBOARD_COLUMNS) -> Iterator[Dict]:
+    """Yield PR analyses from database one row at a time."""
     conn = get_db_connection()
     if not conn:
-        return []
+        return
     
     cursor = conn.cursor()
     
     # Build query (excluding revert chain commits)
-    query = "SELECT * FROM pr_analysis WHERE impact_score > 0"
+    query = f"SELECT {columns} FROM pr_analysis WHERE impact_score > 0"
     params = []
     
     if author_filter:
@@ -150,25 +252,8 @@ def get_all_analyses(author_filter: Optional[str] = None, sort_by: str = "impact
     
     cursor.execute(query, params)
     columns = [description[0] for description in cursor.description]
-    results = []
-    
-    for row in cursor.fetchall():
-        result = dict(zip(columns, row))
-        # Convert date strings to datetime objects for better formatting
-        if result['merge_date']:
-            try:
-                result['merge_date'] = datetime.fromisoformat(result['merge_date'].replace('Z', '+00:00'))
-            except:
-                pass
-        if result['analyzed_at']:
-            try:
-                result['analyzed_at'] = datetime.fromisoformat(result['analyzed_at'].replace('Z', '+00:00'))
-            except:
-                pass
-        results.append(result)
-    
-    conn.close()
-    return results
+    for row in cursor:
+        yield dict(zip(columns, row))
 
 def get_summary_stats(time_filter: Optional[str] = None) -> Dict:
     """Get summary statistics."""
@@ -203,14 +288,19 @@ def get_summary_stats(time_filter: Optional[str] = None) -> Dict:
     total_impact_points = calculate_total_impact_points(all_scores)
     overall_distribution = calculate_score_distribution(all_scores)
     
-    # Get stats by author (excluding revert chain commits)
+    # Get stats and score counts by author in one pass (excluding revert chain commits)
     cursor.execute(f"""
         SELECT 
             author,
             COUNT(*) as merge_count,
             SUM(additions) as total_additions,
             SUM(deletions) as total_deletions,
-            SUM(files_changed) as total_files_changed
+            SUM(files_changed) as total_files_changed,
+            SUM(CASE WHEN impact_score = 1 THEN 1 ELSE 0 END) as s1,
+            SUM(CASE WHEN impact_score = 2 THEN 1 ELSE 0 END) as s2,
+            SUM(CASE WHEN impact_score = 3 THEN 1 ELSE 0 END) as s3,
+            SUM(CASE WHEN impact_score = 4 THEN 1 ELSE 0 END) as s4,
+            SUM(CASE WHEN impact_score = 5 THEN 1 ELSE 0 END) as s5
         FROM pr_analysis 
         {base_where}
         GROUP BY author
@@ -221,16 +311,11 @@ def get_summary_stats(time_filter: Optional[str] = None) -> Dict:
     # Calculate impact points for each author
     author_stats = []
     for row in author_results:
-        author, merge_count, total_additions, total_deletions, total_files_changed = row
-        
-        # Get individual scores for this author (excluding revert chain commits)
-        author_where = f"{base_where} AND author = ?"
-        author_params = date_params + [author]
-        cursor.execute(f"SELECT impact_score FROM pr_analysis {author_where}", author_params)
-        author_scores = [row[0] for row in cursor.fetchall()]
+        author, merge_count, total_additions, total_deletions, total_files_changed = row[:5]
+        score_counts = dict(zip(range(1, 6), row[5:]))
         
-        author_impact_points = calculate_total_impact_points(author_scores)
-        author_distribution = calculate_score_distribution(author_scores)
+        author_impact_points = calculate_impact_points_from_counts(score_counts, merge_count)
+        author_distribution = build_score_distribution(score_counts, merge_count)
         
         author_stats.append({
             'author': author,
@@ -245,8 +330,6 @@ def get_summary_stats(time_filter: Optional[str] = None) -> Dict:
     # Sort by impact points (descending)
     author_stats.sort(key=lambda x: x['impact_points'], reverse=True)
     
-    conn.close()
-    
     return {
         'overall': {
             'total_analyses': overall_stats[0] or 0,
@@ -258,18 +341,6 @@ def get_summary_stats(time_filter: Optional[str] = None) -> Dict:
         'by_author': author_stats
     }
 
-def get_unique_authors() -> List[str]:
-    """Get list of unique authors (excluding revert chain commits)."""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT author FROM pr_analysis WHERE impact_score > 0 ORDER BY author")
-    authors = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return authors
-
 def get_analysis_by_hash(merge_hash: str) -> Optional[Dict]:
     """Get single analysis by merge hash."""
     conn = get_db_connection()
@@ -277,29 +348,14 @@ def get_analysis_by_hash(merge_hash: str) -> Optional[Dict]:
         return None
     
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM pr_analysis WHERE merge_hash = ?", (merge_hash,))
+    cursor.execute(f"SELECT {DETAIL_COLUMNS} FROM pr_analysis WHERE merge_hash = ?", (merge_hash,))
     columns = [description[0] for description in cursor.description]
     row = cursor.fetchone()
     
     if not row:
-        conn.close()
         return None
     
-    result = dict(zip(columns, row))
-    # Convert date strings to datetime objects for better formatting
-    if result['merge_date']:
-        try:
-            result['merge_date'] = datetime.fromisoformat(result['merge_date'].replace('Z', '+00:00'))
-        except:
-            pass
-    if result['analyzed_at']:
-        try:
-            result['analyzed_at'] = datetime.fromisoformat(result['analyzed_at'].replace('Z', '+00:00'))
-        except:
-            pass
-    
-    conn.close()
-    return result
+    return dict(zip(columns, row))
 
 @app.route('/')
 def index():
@@ -313,7 +369,6 @@ def index():
     # Get data
     analyses = get_all_analyses(author_filter, sort_by, sort_order, time_filter)
     stats = get_summary_stats(time_filter)
-    authors = get_unique_authors()
     
     if not analyses:
         return render_template('no_data.html')
@@ -336,6 +391,20 @@ def commit_detail(merge_hash: str):
     
     analysis = get_analysis_by_hash(merge_hash)
     
+    if not analysis:
+        return "Commit not found", 404
+    
+    # The diff is fetched separately by the page (see commit_diff)
+    return render_template('commit_detail.html', 
+                         analysis=analysis, 
+                         current_author=author_filter,
+                         current_time_filter=time_filter)
+
+@app.route('/commit/<merge_hash>/diff')
+def commit_diff(merge_hash: str):
+    """Rendered diff for the commit detail page, loaded after the page itself."""
+    analysis = get_analysis_by_hash(merge_hash)
+    
     if not analysis:
         return "Commit not found", 404
     
@@ -350,11 +419,7 @@ def commit_detail(merge_hash: str):
     if repo_path:
         diff_content = get_merge_diff(repo_path, merge_hash)
     
-    return render_template('commit_detail.html', 
-                         analysis=analysis, 
-                         diff_content=diff_content,
-                         current_author=author_filter,
-                         current_time_filter=time_filter)
+    return render_template('commit_diff.html', diff_content=diff_content)
 
 
 
@@ -367,22 +432,26 @@ def api_analyses():
     sort_by = request.args.get('sort_by', 'impact_score')
     sort_order = request.args.get('sort_order', 'desc')
     
-    analyses = get_all_analyses(author_filter, sort_by, sort_order, time_filter)
-    
-    # Convert datetime objects to strings for JSON serialization
-    for analysis in analyses:
-        if isinstance(analysis.get('merge_date'), datetime):
-            analysis['merge_date'] = analysis['merge_date'].strftime('%Y-%m-%d %H:%M:%S')
-        if isinstance(analysis.get('analyzed_at'), datetime):
-            analysis['analyzed_at'] = analysis['analyzed_at'].strftime('%Y-%m-%d %H:%M:%S')
-    
-    return jsonify(analyses)
+    def generate() -> Iterator[bytes]:
+        # Rows are encoded as they're read, so the full result set is never held in memory
+        yield b'['
+        for i, analysis in enumerate(iter_analyses(author_filter, sort_by, sort_order, time_filter, API_COLUMNS)):
+            # Convert datetime objects to strings for JSON serialization
+            if isinstance(analysis.get('merge_date'), datetime):
+                analysis['merge_date'] = analysis['merge_date'].strftime('%Y-%m-%d %H:%M:%S')
+            if isinstance(analysis.get('analyzed_at'), datetime):
+                analysis['analyzed_at'] = analysis['analyzed_at'].strftime('%Y-%m-%d %H:%M:%S')
+            yield (b',' if i else b'') + encode_json(analysis)
+        yield b']'
+    
+    # Keep the app context (and its DB connection) alive while the response streams
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/stats')
 def api_stats():
     """API endpoint for summary statistics."""
     time_filter = request.args.get('time_filter')
-    return jsonify(get_summary_stats(time_filter))
+    return Response(encode_json(get_summary_stats(time_filter)), mimetype='application/json')
 
 if __name__ == '__main__':
     if not os.path.exists(ANALYSIS_DB_PATH):